@@ -0,0 +1,28 @@
+import functools
+import shutil
+import sys
+from pynonymizer.database.exceptions import DependencyError
+
+"""
+Subprocess helpers shared by the cli-based providers
+"""
+
+# Dumps can be large, so read them through a bigger buffer and kernel pipe than the defaults.
+# Setting the pipe size is only supported from python 3.10.
+DUMP_PIPE_SIZE = 2**20
+DUMP_PIPE_PARAMS = {"bufsize": DUMP_PIPE_SIZE}
+if sys.version_info >= (3, 10):
+    DUMP_PIPE_PARAMS["pipesize"] = DUMP_PIPE_SIZE
+
+
+@functools.lru_cache(maxsize=None)
+def require_binary(name):
+    """
+    Resolve a client binary from the $PATH, raising DependencyError if it's missing.
+    Successful lookups are cached, so the $PATH is only walked once per binary.
+    """
+    path = shutil.which(name)
+    if not path:
+        raise DependencyError(name, f"The '{name}' client must be present in the $PATH")
+
+    return path
@@ -1,7 +1,9 @@
-import shutil
 import shlex
 import subprocess
-from pynonymizer.database.exceptions import DependencyError
+from pynonymizer.database.basic.execution import (
+    require_binary,
+    DUMP_PIPE_PARAMS,
+)
 
 
 def _optional_arg(condition, value):
@@ -15,6 +17,19 @@ def _optional_arg_pair(arg_value_pair):
     return _optional_arg(arg_value_pair[1], arg_value_pair)
 
 
+def _join_statements(statements):
+    """
+    Combine a list of statements into a single script for one mysql process.
+    Unterminated statements get their ; on a new line, so a trailing -- or # comment can't swallow it.
+    A statement whose last ; sits inside a trailing comment (e.g. "SELECT 1 -- done;") is still
+    taken as terminated, and will run together with the next one.
+    """
+    return "\n".join(
+        statement if statement.rstrip().endswith(";") else f"{statement}\n;"
+        for statement in statements
+    )
+
+
 class MySqlDumpRunner:
     def __init__(
         self,
@@ -35,10 +50,9 @@ class MySqlDumpRunner:
         if db_name is None:
             raise ValueError("db_name cannot be null")
 
-        if not (shutil.which("mysqldump")):
-            raise DependencyError(
-                "mysqldump", "The 'mysqldump' client must be present in the $PATH"
-            )
+        require_binary("mysqldump")
+
+        self.__base_params = self.__build_base_params()
 
     def __ifdef(self):
         if self.db_host:
@@ -46,7 +60,7 @@ class MySqlDumpRunner:
         else:
             return []
 
-    def __get_base_params(self):
+    def __build_base_params(self):
         return [
             *_optional_arg_pair(["--host", self.db_host]),
             *_optional_arg_pair(["--port", self.db_port]),
@@ -54,15 +68,38 @@ class MySqlDumpRunner:
             *_optional_arg(self.db_pass, [f"-p{self.db_pass}"]),
         ]
 
+    def __mask_args(self, args):
+        """
+        Replace the password in a list of mysqldump args, so they can be shown in errors and tracebacks
+        """
+        password_arg = f"-p{self.db_pass}"
+        return ["-p******" if arg == password_arg else arg for arg in args]
+
     def open_dumper(self):
         return subprocess.Popen(
-            ["mysqldump"]
-            + self.__get_base_params()
-            + self.additional_opts
-            + [self.db_name],
+            ["mysqldump"] + self.__base_params + self.additional_opts + [self.db_name],
             stdout=subprocess.PIPE,
+            **DUMP_PIPE_PARAMS,
         ).stdout
 
+    def dump_to_file(self, output_path):
+        """
+        Have mysqldump write the current db to output_path itself, and wait for it to finish.
+        Nothing is streamed back, so a failed dump raises a CalledProcessError (with the password masked).
+        """
+        process = subprocess.Popen(
+            ["mysqldump"]
+            + self.__base_params
+            + self.additional_opts
+            + [f"--result-file={output_path}", self.db_name],
+            stdout=subprocess.DEVNULL,
+        )
+        returncode = process.wait()
+        if returncode != 0:
+            raise subprocess.CalledProcessError(
+                returncode, self.__mask_args(process.args)
+            )
+
 
 class MySqlCmdRunner:
     def __init__(
@@ -85,10 +122,12 @@ class MySqlCmdRunner:
         if db_name is None:
             raise ValueError("db_name cannot be null")
 
-        if not (shutil.which("mysql")):
-            raise DependencyError(
-                "mysql", "The 'mysql' client must be present in the $PATH"
-            )
+        require_binary("mysql")
+
+        self.__base_params = self.__build_base_params()
+        # argv prefixes shared by every statement, so each call only has to append its own args
+        self.__params = self.__base_params + self.additional_opts
+        self.__db_params = self.__params + [self.db_name]
 
     def __mask_subprocess_error(self, error):
         """
@@ -109,7 +148,7 @@ class MySqlCmdRunner:
         ]
         raise error from None
 
-    def __get_base_params(self):
+    def __build_base_params(self):
         return [
             "mysql",
             *_optional_arg_pair(["-h", self.db_host]),
@@ -118,7 +157,41 @@ class MySqlCmdRunner:
             *_optional_arg(self.db_pass, [f"-p{self.db_pass}"]),
         ]
 
+    def __execute_script(self, params, statements):
+        """
+        Run a list of statements as one script, fed through the stdin of a single mysql process
+        """
+        if not statements:
+            return []
+
+        process = subprocess.Popen(
+            params, stdin=subprocess.PIPE, stdout=subprocess.PIPE
+        )
+        output, _ = process.communicate(_join_statements(statements).encode())
+        if process.returncode != 0:
+            self.__mask_subprocess_error(
+                subprocess.CalledProcessError(process.returncode, params, output)
+            )
+
+        return [output]
+
+    def execute_many(self, statements):
+        """
+        Run a list of statements in a single mysql process, returning one combined output
+        """
+        return self.__execute_script(self.__params, statements)
+
+    def db_execute_many(self, statements):
+        """
+        Run a list of statements against the db in a single mysql process, returning one combined output
+        """
+        return self.__execute_script(self.__db_params, statements)
+
     def execute(self, statements):
+        """
+        Run a statement, or a list of statements, returning one output per statement.
+        Use execute_many to run a list in a single process when per-statement output isn't needed.
+        """
         if not isinstance(statements, list):
             statements = [statements]
 
@@ -127,11 +200,7 @@ class MySqlCmdRunner:
         for statement in statements:
             try:
                 outputs.append(
-                    subprocess.check_output(
-                        self.__get_base_params()
-                        + self.additional_opts
-                        + ["--execute", statement]
-                    )
+                    subprocess.check_output(self.__params + ["--execute", statement])
                 )
             except subprocess.CalledProcessError as error:
                 self.__mask_subprocess_error(error)
@@ -139,6 +208,10 @@ class MySqlCmdRunner:
         return outputs
 
     def db_execute(self, statements):
+        """
+        Run a statement, or a list of statements, against the db, returning one output per statement.
+        Use db_execute_many to run a list in a single process when per-statement output isn't needed.
+        """
         if not isinstance(statements, list):
             statements = [statements]
 
@@ -147,11 +220,7 @@ class MySqlCmdRunner:
         for statement in statements:
             try:
                 outputs.append(
-                    subprocess.check_output(
-                        self.__get_base_params()
-                        + self.additional_opts
-                        + [self.db_name, "--execute", statement]
-                    )
+                    subprocess.check_output(self.__db_params + ["--execute", statement])
                 )
             except subprocess.CalledProcessError as error:
                 self.__mask_subprocess_error(error)
@@ -161,7 +230,7 @@ class MySqlCmdRunner:
     def get_single_result(self, statement):
         try:
             return subprocess.check_output(
-                self.__get_base_params()
+                self.__base_params
                 + ["-sN", *self.additional_opts, self.db_name, "--execute", statement]
             ).decode()
         except subprocess.CalledProcessError as error:
@@ -170,7 +239,7 @@ class MySqlCmdRunner:
     def open_batch_processor(self):
         self.close_batch_processor()
         self.process = subprocess.Popen(
-            self.__get_base_params() + self.additional_opts + [self.db_name],
+            self.__db_params,
             stdin=subprocess.PIPE,
         )
         return self.process.stdin
@@ -5,7 +5,7 @@ from pynonymizer.database.provider import DatabaseProvider
 from pynonymizer.database.exceptions import UnsupportedTableStrategyError
 from pynonymizer.database.postgres import execution, query_factory
 from pynonymizer.database.basic.input import resolve_input
-from pynonymizer.database.basic.output import resolve_output
+from pynonymizer.database.basic.output import resolve_output, RawOutput
 from pynonymizer.strategy.table import TableStrategyTypes
 
 
@@ -163,7 +163,7 @@ class PostgreSqlProvider(DatabaseProvider):
                         statements = query_factory.get_update_table(
                             SEED_TABLE_NAME, table_strategy
                         )
-                        self.__runner.db_execute(statements)
+                        self.__runner.db_execute_many(statements)
 
                     else:
                         raise UnsupportedTableStrategyError(table_strategy)
@@ -211,11 +211,18 @@ class PostgreSqlProvider(DatabaseProvider):
 
     def dump_database(self, output_path):
         """
-        Feed an output with stdout from the dump binary
+        Dump the database to output_path. Plain .sql files are written by the pg_dump binary itself,
+        any other output is fed with its stdout.
         :param output_path:
         :return:
         """
         output_obj = resolve_output(output_path)
+        if isinstance(output_obj, RawOutput):
+            # pg_dump can write plain sql files itself, without streaming them through python
+            self.logger.info("Dumping to %s", output_obj.filename)
+            self.__dumper.dump_to_file(output_obj.filename)
+            return
+
         dumpsize_estimate = self.__estimate_dumpsize()
 
         dump_process = self.__dumper.open_dumper()
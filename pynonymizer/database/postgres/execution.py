@@ -1,7 +1,6 @@
-import shutil
 import shlex
 import subprocess
-from pynonymizer.database.exceptions import DependencyError
+from pynonymizer.database.basic.execution import require_binary, DUMP_PIPE_PARAMS
 import os
 
 """
@@ -20,12 +19,11 @@ class PSqlDumpRunner:
         self.db_port = db_port
         self.additional_opts = shlex.split(additional_opts)
 
-        if not (shutil.which("pg_dump")):
-            raise DependencyError(
-                "pg_dump", "The 'pg_dump' client must be present in the $PATH"
-            )
+        require_binary("pg_dump")
+
+        self.__base_params = self.__build_base_params()
 
-    def __get_base_params(self):
+    def __build_base_params(self):
         return [
             "pg_dump",
             "--host",
@@ -45,11 +43,28 @@ class PSqlDumpRunner:
 
     def open_dumper(self):
         return subprocess.Popen(
-            self.__get_base_params() + self.additional_opts + [self.db_name],
+            self.__base_params + self.additional_opts + [self.db_name],
             stdout=subprocess.PIPE,
+            **DUMP_PIPE_PARAMS,
             env=self.__get_env(),
         ).stdout
 
+    def dump_to_file(self, output_path):
+        """
+        Have pg_dump write the current db to output_path itself, and wait for it to finish.
+        Nothing is streamed back, so a failed dump raises a CalledProcessError.
+        """
+        process = subprocess.Popen(
+            self.__base_params
+            + self.additional_opts
+            + ["--file", output_path, self.db_name],
+            stdout=subprocess.DEVNULL,
+            env=self.__get_env(),
+        )
+        returncode = process.wait()
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, process.args)
+
 
 class PSqlCmdRunner:
     def __init__(
@@ -63,12 +78,18 @@ class PSqlCmdRunner:
         self.additional_opts = shlex.split(additional_opts)
         self.process = None
 
-        if not (shutil.which("psql")):
-            raise DependencyError(
-                "psql", "The 'psql' client must be present in the $PATH"
-            )
+        require_binary("psql")
 
-    def __get_base_params(self):
+        self.__base_params = self.__build_base_params()
+        # argv prefixes shared by every statement, so each call only has to append its own args
+        self.__params = self.__base_params + self.additional_opts
+        self.__db_params = self.__base_params + [
+            "--dbname",
+            self.db_name,
+            *self.additional_opts,
+        ]
+
+    def __build_base_params(self):
         return [
             "psql",
             "--host",
@@ -86,7 +107,39 @@ class PSqlCmdRunner:
 
         return new_env
 
+    def __execute_commands(self, params, statements):
+        """
+        Run a list of statements in a single psql process, passing each one as its own --command.
+        --command strings are sent to the server as-is, so unlike a script on stdin,
+        psql won't expand :variables or run backslash meta-commands found in the statements.
+        ON_ERROR_STOP makes psql stop and exit non-zero at the first failing statement.
+        """
+        if not statements:
+            return []
+
+        command_params = ["--set", "ON_ERROR_STOP=1"]
+        for statement in statements:
+            command_params += ["--command", statement]
+
+        return [subprocess.check_output(params + command_params, env=self.__get_env())]
+
+    def execute_many(self, statements):
+        """
+        Run a list of statements in a single psql process, returning one combined output
+        """
+        return self.__execute_commands(self.__params, statements)
+
+    def db_execute_many(self, statements):
+        """
+        Run a list of statements against the db in a single psql process, returning one combined output
+        """
+        return self.__execute_commands(self.__db_params, statements)
+
     def execute(self, statements):
+        """
+        Run a statement, or a list of statements, returning one output per statement.
+        Use execute_many to run a list in a single process when per-statement output isn't needed.
+        """
         if not isinstance(statements, list):
             statements = [statements]
 
@@ -95,9 +148,7 @@ class PSqlCmdRunner:
         for statement in statements:
             outputs.append(
                 subprocess.check_output(
-                    self.__get_base_params()
-                    + self.additional_opts
-                    + ["--command", statement],
+                    self.__params + ["--command", statement],
                     env=self.__get_env(),
                 )
             )
@@ -105,6 +156,10 @@ class PSqlCmdRunner:
         return outputs
 
     def db_execute(self, statements):
+        """
+        Run a statement, or a list of statements, against the db, returning one output per statement.
+        Use db_execute_many to run a list in a single process when per-statement output isn't needed.
+        """
         if not isinstance(statements, list):
             statements = [statements]
 
@@ -113,14 +168,7 @@ class PSqlCmdRunner:
         for statement in statements:
             outputs.append(
                 subprocess.check_output(
-                    self.__get_base_params()
-                    + [
-                        "--dbname",
-                        self.db_name,
-                        *self.additional_opts,
-                        "--command",
-                        statement,
-                    ],
+                    self.__db_params + ["--command", statement],
                     env=self.__get_env(),
                 )
             )
@@ -129,7 +177,7 @@ class PSqlCmdRunner:
 
     def get_single_result(self, statement):
         return subprocess.check_output(
-            self.__get_base_params()
+            self.__base_params
             + [
                 "--dbname",
                 self.db_name,
@@ -144,7 +192,7 @@ class PSqlCmdRunner:
     def open_batch_processor(self):
         self.close_batch_processor()
         self.process = subprocess.Popen(
-            self.__get_base_params()
+            self.__base_params
             + ["--dbname", self.db_name, "--quiet"]
             + self.additional_opts,
             env=self.__get_env(),
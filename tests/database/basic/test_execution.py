@@ -0,0 +1,25 @@
+from pynonymizer.database.basic.execution import require_binary
+from pynonymizer.database.exceptions import DependencyError
+from unittest.mock import patch
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def clear_binary_cache():
+    require_binary.cache_clear()
+    yield
+    require_binary.cache_clear()
+
+
+@patch("shutil.which", return_value=None)
+def test_require_binary__when_missing__should_raise(which):
+    with pytest.raises(DependencyError):
+        require_binary("mysql")
+
+
+@patch("shutil.which", return_value="fake/path/to/mysql")
+def test_require_binary__should_only_search_path_once(which):
+    assert require_binary("mysql") == "fake/path/to/mysql"
+    assert require_binary("mysql") == "fake/path/to/mysql"
+
+    which.assert_called_once_with("mysql")
@@ -0,0 +1,43 @@
+import pytest
+from unittest.mock import patch
+from pynonymizer.database.basic.execution import require_binary
+
+"""
+Subprocess fixtures for the cli-based runner tests.
+These aren't autouse, modules opt in with pytestmark = pytest.mark.usefixtures(...)
+"""
+
+
+@pytest.fixture(scope="module")
+def which():
+    require_binary.cache_clear()
+    with patch("shutil.which", return_value="fake/path/to/executable") as which:
+        yield which
+    require_binary.cache_clear()
+
+
+@pytest.fixture
+def fresh_which(which):
+    """
+    The which mock with nothing cached yet, for tests of the $PATH lookup itself
+    """
+    require_binary.cache_clear()
+    which.reset_mock()
+    yield which
+    which.return_value = "fake/path/to/executable"
+    require_binary.cache_clear()
+
+
+@pytest.fixture
+def popen():
+    with patch("subprocess.Popen") as popen:
+        popen.return_value.communicate.return_value = (b"output", None)
+        popen.return_value.returncode = 0
+        popen.return_value.wait.return_value = 0
+        yield popen
+
+
+@pytest.fixture
+def check_output():
+    with patch("subprocess.check_output", autospec=True) as check_output:
+        yield check_output
@@ -1,13 +1,97 @@
 import pytest
-import unittest
-from unittest.mock import patch, Mock
+from unittest.mock import call
 from pynonymizer.database.exceptions import DependencyError
 from pynonymizer.database.mysql.execution import MySqlDumpRunner, MySqlCmdRunner
+from tests.helpers import DUMP_PIPE_PARAMS
 import subprocess
 
+pytestmark = pytest.mark.usefixtures("which", "popen", "check_output")
+
+
+@pytest.fixture(scope="module")
+def dump_runner_no_optional_args():
+    return MySqlDumpRunner(
+        db_host=None,
+        db_user=None,
+        db_pass=None,
+        db_name="db_name",
+        db_port=None,
+        additional_opts="--quick --single-transaction",
+    )
+
+
+@pytest.fixture(scope="module")
+def dump_runner_additional_opts():
+    return MySqlDumpRunner(
+        db_host="1.2.3.4",
+        db_user="db_user",
+        db_pass="db_password",
+        db_name="db_name",
+        db_port=None,
+        additional_opts="--quick --single-transaction",
+    )
+
+
+@pytest.fixture(scope="module")
+def dump_runner_default_port():
+    return MySqlDumpRunner(
+        db_host="1.2.3.4",
+        db_user="db_user",
+        db_pass="db_password",
+        db_name="db_name",
+        db_port=None,
+    )
+
+
+@pytest.fixture(scope="module")
+def dump_runner_custom_port():
+    return MySqlDumpRunner(
+        "1.2.3.4", "db_user", "db_password", "db_name", db_port="3307"
+    )
+
+
+@pytest.fixture(scope="module")
+def cmd_runner_no_optional_args():
+    return MySqlCmdRunner(
+        db_user=None,
+        db_pass=None,
+        db_name="db_name",
+        db_host=None,
+        db_port=None,
+        additional_opts="--quick --single-transaction",
+    )
+
+
+@pytest.fixture(scope="module")
+def cmd_runner():
+    return MySqlCmdRunner(
+        "1.2.3.4",
+        "db_user",
+        "db_password",
+        "db_name",
+        db_port="3306",
+        additional_opts="--quick --single-transaction",
+    )
+
+
+# open_batch_processor keeps its process on the (module-scoped) runner, so close it after each test
+@pytest.fixture
+def batch_cmd_runner_no_optional_args(cmd_runner_no_optional_args):
+    yield cmd_runner_no_optional_args
+    cmd_runner_no_optional_args.close_batch_processor()
+
+
+@pytest.fixture
+def batch_cmd_runner(cmd_runner):
+    yield cmd_runner
+    cmd_runner.close_batch_processor()
+
+
+class TestNoExecutablesInPath:
+    @pytest.fixture(autouse=True)
+    def _setup(self, fresh_which):
+        fresh_which.return_value = None
 
-@patch("shutil.which", Mock(return_value=None))
-class NoExecutablesInPathTests(unittest.TestCase):
     def test_dump_runner_missing_mysqldump(self):
         with pytest.raises(DependencyError):
             MySqlDumpRunner("1.2.3.4", "user", "password", "name", db_port=None)
@@ -17,392 +101,371 @@ class NoExecutablesInPathTests(unittest.TestCase):
             MySqlCmdRunner("1.2.3.4", "user", "password", "name", db_port=None)
 
 
-@patch("subprocess.Popen")
-@patch("subprocess.check_output")
-@patch("shutil.which", Mock(return_value="fake/path/to/executable"))
-class DumperTests(unittest.TestCase):
-    def test_open_dumper__when_omitting_optional_args__should_not_pass_args(
-        self, check_output, popen
-    ):
-        dump_runner = MySqlDumpRunner(
-            db_host=None,
-            db_user=None,
-            db_pass=None,
-            db_name="db_name",
-            db_port=None,
-            additional_opts="--quick --single-transaction",
-        )
-
-        open_result = dump_runner.open_dumper()
-
-        # dumper should open a process for the current db dump, piping stdout for processing
-        popen.assert_called_with(
-            [
-                "mysqldump",
-                "--quick",
-                "--single-transaction",
-                "db_name",
-            ],
-            stdout=subprocess.PIPE,
-        )
-
-    def test_open_dumper__when_using_additional_opts__should_pass_split_args_to_popen(
-        self, check_output, popen
-    ):
-        dump_runner = MySqlDumpRunner(
-            db_host="1.2.3.4",
-            db_user="db_user",
-            db_pass="db_password",
-            db_name="db_name",
-            db_port=None,
-            additional_opts="--quick --single-transaction",
-        )
-
-        open_result = dump_runner.open_dumper()
-
-        # dumper should open a process for the current db dump, piping stdout for processing
-        popen.assert_called_with(
-            [
-                "mysqldump",
-                "--host",
-                "1.2.3.4",
-                "--user",
-                "db_user",
-                "-pdb_password",
-                "--quick",
-                "--single-transaction",
-                "db_name",
-            ],
-            stdout=subprocess.PIPE,
-        )
-
-    def test_open_dumper__when_port_is_not_passed__should_use_defaults(
-        self, check_output, popen
-    ):
-        dump_runner = MySqlDumpRunner(
-            db_host="1.2.3.4",
-            db_user="db_user",
-            db_pass="db_password",
-            db_name="db_name",
-            db_port=None,
-        )
-        open_result = dump_runner.open_dumper()
-
-        # dumper should open a process for the current db dump, piping stdout for processing
-        popen.assert_called_with(
-            [
-                "mysqldump",
-                "--host",
-                "1.2.3.4",
-                "--user",
-                "db_user",
-                "-pdb_password",
-                "db_name",
-            ],
-            stdout=subprocess.PIPE,
-        )
-
-        # dumper should return the stdout of that process
-        assert open_result == popen.return_value.stdout
-
-    def test_open_dumper__when_port_is_passed__should_use_passed(
-        self, check_output, popen
-    ):
-        dump_runner = MySqlDumpRunner(
-            "1.2.3.4", "db_user", "db_password", "db_name", db_port="3307"
-        )
-        open_result = dump_runner.open_dumper()
-
-        # dumper should open a process for the current db dump, piping stdout for processing
-        popen.assert_called_with(
-            [
-                "mysqldump",
-                "--host",
-                "1.2.3.4",
-                "--port",
-                "3307",
-                "--user",
-                "db_user",
-                "-pdb_password",
-                "db_name",
-            ],
-            stdout=subprocess.PIPE,
-        )
-
-        # dumper should return the stdout of that process
-        assert open_result == popen.return_value.stdout
-
-
-@patch("subprocess.Popen")
-@patch("subprocess.check_output")
-@patch("shutil.which", Mock(return_value="fake/path/to/executable"))
-class CmdTests(unittest.TestCase):
-    def test__batch_processor__when_omitted_optional_args__should_not_call_cli_with_args(
-        self, check_output, popen
-    ):
-        cmd_runner = MySqlCmdRunner(
-            db_user=None,
-            db_pass=None,
-            db_name="db_name",
-            db_host=None,
-            db_port=None,
-            additional_opts="--quick --single-transaction",
-        )
-        open_result = cmd_runner.open_batch_processor()
-
-        popen.assert_called_with(
-            [
-                "mysql",
-                "--quick",
-                "--single-transaction",
-                "db_name",
-            ],
-            stdin=subprocess.PIPE,
-        )
+def test_runner_construction__should_only_search_path_once(fresh_which):
+    MySqlCmdRunner("1.2.3.4", "user", "password", "name", db_port=None)
+    MySqlCmdRunner("1.2.3.4", "user", "password", "name", db_port=None)
+
+    fresh_which.assert_called_once_with("mysql")
+
 
-    def test_open_batch_processor(self, check_output, popen):
-        cmd_runner = MySqlCmdRunner(
+def test_open_dumper__when_omitting_optional_args__should_not_pass_args(
+    dump_runner_no_optional_args, popen
+):
+    open_result = dump_runner_no_optional_args.open_dumper()
+
+    # dumper should open a process for the current db dump, piping stdout for processing
+    popen.assert_called_with(
+        [
+            "mysqldump",
+            "--quick",
+            "--single-transaction",
+            "db_name",
+        ],
+        stdout=subprocess.PIPE,
+        **DUMP_PIPE_PARAMS,
+    )
+
+
+def test_open_dumper__when_using_additional_opts__should_pass_split_args_to_popen(
+    dump_runner_additional_opts, popen
+):
+    open_result = dump_runner_additional_opts.open_dumper()
+
+    # dumper should open a process for the current db dump, piping stdout for processing
+    popen.assert_called_with(
+        [
+            "mysqldump",
+            "--host",
             "1.2.3.4",
+            "--user",
             "db_user",
-            "db_password",
+            "-pdb_password",
+            "--quick",
+            "--single-transaction",
             "db_name",
-            db_port="3306",
-            additional_opts="--quick --single-transaction",
-        )
-        open_result = cmd_runner.open_batch_processor()
-
-        # dumper should open a process for the current db dump, piping stdout for processing
-        popen.assert_called_with(
-            [
-                "mysql",
-                "-h",
-                "1.2.3.4",
-                "-P",
-                "3306",
-                "-u",
-                "db_user",
-                "-pdb_password",
-                "--quick",
-                "--single-transaction",
-                "db_name",
-            ],
-            stdin=subprocess.PIPE,
-        )
-
-        # dumper should return the stdin of that process
-        assert open_result == popen.return_value.stdin
-
-    def test__execute__when_omitted_optional_args__should_not_call_cli_with_args(
-        self, check_output, popen
-    ):
-        cmd_runner = MySqlCmdRunner(
-            db_user=None,
-            db_pass=None,
-            db_name="db_name",
-            db_host=None,
-            db_port=None,
-            additional_opts="--quick --single-transaction",
-        )
-        execute_result = cmd_runner.execute("SELECT `column` from `table`;")
-
-        check_output.assert_called_with(
-            [
-                "mysql",
-                "--quick",
-                "--single-transaction",
-                "--execute",
-                "SELECT `column` from `table`;",
-            ]
-        )
-
-    def test_execute(self, check_output, popen):
-        """
-        execute should execute an arbitrary statement with valid args
-        """
-        cmd_runner = MySqlCmdRunner(
+        ],
+        stdout=subprocess.PIPE,
+        **DUMP_PIPE_PARAMS,
+    )
+
+
+def test_open_dumper__when_port_is_not_passed__should_use_defaults(
+    dump_runner_default_port, popen
+):
+    open_result = dump_runner_default_port.open_dumper()
+
+    # dumper should open a process for the current db dump, piping stdout for processing
+    popen.assert_called_with(
+        [
+            "mysqldump",
+            "--host",
             "1.2.3.4",
+            "--user",
             "db_user",
-            "db_password",
+            "-pdb_password",
             "db_name",
-            db_port="3306",
-            additional_opts="--quick --single-transaction",
-        )
-        execute_result = cmd_runner.execute("SELECT `column` from `table`;")
+        ],
+        stdout=subprocess.PIPE,
+        **DUMP_PIPE_PARAMS,
+    )
 
-        check_output.assert_called_with(
-            [
-                "mysql",
-                "-h",
-                "1.2.3.4",
-                "-P",
-                "3306",
-                "-u",
-                "db_user",
-                "-pdb_password",
-                "--quick",
-                "--single-transaction",
-                "--execute",
-                "SELECT `column` from `table`;",
-            ]
-        )
+    # dumper should return the stdout of that process
+    assert open_result == popen.return_value.stdout
 
-    def test_execute_list(self, check_output, popen):
-        cmd_runner = MySqlCmdRunner(
+
+def test_open_dumper__when_port_is_passed__should_use_passed(
+    dump_runner_custom_port, popen
+):
+    open_result = dump_runner_custom_port.open_dumper()
+
+    # dumper should open a process for the current db dump, piping stdout for processing
+    popen.assert_called_with(
+        [
+            "mysqldump",
+            "--host",
             "1.2.3.4",
+            "--port",
+            "3307",
+            "--user",
             "db_user",
-            "db_password",
+            "-pdb_password",
             "db_name",
-            db_port="3306",
-            additional_opts="--quick --single-transaction",
-        )
-        execute_result = cmd_runner.execute(
-            ["SELECT `column` from `table`;", "SELECT `column2` from `table2`;"]
-        )
-
-        check_output.assert_any_call(
-            [
-                "mysql",
-                "-h",
-                "1.2.3.4",
-                "-P",
-                "3306",
-                "-u",
-                "db_user",
-                "-pdb_password",
-                "--quick",
-                "--single-transaction",
-                "--execute",
-                "SELECT `column` from `table`;",
-            ]
-        )
+        ],
+        stdout=subprocess.PIPE,
+        **DUMP_PIPE_PARAMS,
+    )
 
-        check_output.assert_any_call(
-            [
-                "mysql",
-                "-h",
-                "1.2.3.4",
-                "-P",
-                "3306",
-                "-u",
-                "db_user",
-                "-pdb_password",
-                "--quick",
-                "--single-transaction",
-                "--execute",
-                "SELECT `column2` from `table2`;",
-            ]
-        )
-
-    def test_db_execute(self, check_output, popen):
-        """
-        execute should execute an arbitrary statement with valid args
-        """
-        cmd_runner = MySqlCmdRunner(
+    # dumper should return the stdout of that process
+    assert open_result == popen.return_value.stdout
+
+
+def test_dump_to_file__should_write_result_file(dump_runner_custom_port, popen):
+    dump_runner_custom_port.dump_to_file("/tmp/x.sql")
+
+    # dumper should have mysqldump write the file directly, without piping stdout
+    popen.assert_called_with(
+        [
+            "mysqldump",
+            "--host",
             "1.2.3.4",
+            "--port",
+            "3307",
+            "--user",
             "db_user",
-            "db_password",
+            "-pdb_password",
+            "--result-file=/tmp/x.sql",
+            "db_name",
+        ],
+        stdout=subprocess.DEVNULL,
+    )
+
+    # dumper should wait for mysqldump to finish
+    popen.return_value.wait.assert_called_once_with()
+
+
+def test_dump_to_file__when_process_fails__should_raise_masked_error(
+    dump_runner_custom_port, popen
+):
+    popen.return_value.wait.return_value = 2
+    popen.return_value.args = [
+        "mysqldump",
+        "--user",
+        "db_user",
+        "-pdb_password",
+        "db_name",
+    ]
+
+    with pytest.raises(subprocess.CalledProcessError) as e_info:
+        dump_runner_custom_port.dump_to_file("/tmp/x.sql")
+
+    assert e_info.value.returncode == 2
+    assert e_info.value.cmd == [
+        "mysqldump",
+        "--user",
+        "db_user",
+        "-p******",
+        "db_name",
+    ]
+
+
+def test__batch_processor__when_omitted_optional_args__should_not_call_cli_with_args(
+    batch_cmd_runner_no_optional_args, popen
+):
+    open_result = batch_cmd_runner_no_optional_args.open_batch_processor()
+
+    popen.assert_called_with(
+        [
+            "mysql",
+            "--quick",
+            "--single-transaction",
             "db_name",
-            db_port="3306",
-            additional_opts="--quick --single-transaction",
-        )
-        execute_result = cmd_runner.db_execute("SELECT `column` from `table`;")
+        ],
+        stdin=subprocess.PIPE,
+    )
 
-        check_output.assert_called_with(
-            [
-                "mysql",
-                "-h",
-                "1.2.3.4",
-                "-P",
-                "3306",
-                "-u",
-                "db_user",
-                "-pdb_password",
-                "--quick",
-                "--single-transaction",
-                "db_name",
-                "--execute",
-                "SELECT `column` from `table`;",
-            ]
-        )
 
-    def test_db_execute_list(self, check_output, popen):
-        cmd_runner = MySqlCmdRunner(
+def test_open_batch_processor(batch_cmd_runner, popen):
+    open_result = batch_cmd_runner.open_batch_processor()
+
+    # dumper should open a process for the current db dump, piping stdout for processing
+    popen.assert_called_with(
+        [
+            "mysql",
+            "-h",
             "1.2.3.4",
+            "-P",
+            "3306",
+            "-u",
             "db_user",
-            "db_password",
+            "-pdb_password",
+            "--quick",
+            "--single-transaction",
             "db_name",
-            db_port="3306",
-            additional_opts="--quick --single-transaction",
-        )
-        execute_result = cmd_runner.db_execute(
-            ["SELECT `column` from `table`;", "SELECT `column2` from `table2`;"]
-        )
-
-        check_output.assert_any_call(
+        ],
+        stdin=subprocess.PIPE,
+    )
+
+    # dumper should return the stdin of that process
+    assert open_result == popen.return_value.stdin
+
+
+def test__execute__when_omitted_optional_args__should_not_call_cli_with_args(
+    cmd_runner_no_optional_args, check_output
+):
+    execute_result = cmd_runner_no_optional_args.execute(
+        "SELECT `column` from `table`;"
+    )
+
+    check_output.assert_called_with(
+        [
+            "mysql",
+            "--quick",
+            "--single-transaction",
+            "--execute",
+            "SELECT `column` from `table`;",
+        ]
+    )
+
+
+_MYSQL_BASE_ARGV = [
+    "mysql",
+    "-h",
+    "1.2.3.4",
+    "-P",
+    "3306",
+    "-u",
+    "db_user",
+    "-pdb_password",
+]
+
+
+@pytest.mark.parametrize(
+    "method,statement,expected_argv",
+    [
+        (
+            "execute",
+            "SELECT `column` from `table`;",
             [
-                "mysql",
-                "-h",
-                "1.2.3.4",
-                "-P",
-                "3306",
-                "-u",
-                "db_user",
-                "-pdb_password",
+                *_MYSQL_BASE_ARGV,
                 "--quick",
                 "--single-transaction",
-                "db_name",
                 "--execute",
                 "SELECT `column` from `table`;",
-            ]
-        )
-        check_output.assert_any_call(
+            ],
+        ),
+        (
+            "db_execute",
+            "SELECT `column` from `table`;",
             [
-                "mysql",
-                "-h",
-                "1.2.3.4",
-                "-P",
-                "3306",
-                "-u",
-                "db_user",
-                "-pdb_password",
+                *_MYSQL_BASE_ARGV,
                 "--quick",
                 "--single-transaction",
                 "db_name",
                 "--execute",
-                "SELECT `column2` from `table2`;",
-            ]
-        )
-
-    def test_get_single_result(self, check_output, popen):
-        """
-        execute should execute an arbitrary statement and return the decoded, no-column result
-        """
-        cmd_runner = MySqlCmdRunner(
-            "1.2.3.4",
-            "db_user",
-            "db_password",
-            "db_name",
-            db_port="3306",
-            additional_opts="--quick --single-transaction",
-        )
-        single_result = cmd_runner.get_single_result("SELECT `column` from `table`;")
-
-        check_output.assert_called_with(
+                "SELECT `column` from `table`;",
+            ],
+        ),
+        (
+            "get_single_result",
+            "SELECT `column` from `table`;",
             [
-                "mysql",
-                "-h",
-                "1.2.3.4",
-                "-P",
-                "3306",
-                "-u",
-                "db_user",
-                "-pdb_password",
+                *_MYSQL_BASE_ARGV,
                 "-sN",
                 "--quick",
                 "--single-transaction",
                 "db_name",
                 "--execute",
                 "SELECT `column` from `table`;",
-            ]
-        )
-        assert single_result == check_output.return_value.decode.return_value
+            ],
+        ),
+    ],
+)
+def test_cmd_runner_argv(cmd_runner, check_output, method, statement, expected_argv):
+    """
+    each statement method should call the mysql cli with the full set of args
+    """
+    getattr(cmd_runner, method)(statement)
+
+    check_output.assert_called_once_with(expected_argv)
+
+
+def test_get_single_result(cmd_runner, check_output):
+    """
+    get_single_result should return the decoded, no-column result
+    """
+    single_result = cmd_runner.get_single_result("SELECT `column` from `table`;")
+
+    assert single_result == check_output.return_value.decode.return_value
+
+
+@pytest.mark.parametrize(
+    "method,expected_prefix",
+    [
+        ("execute", [*_MYSQL_BASE_ARGV, "--quick", "--single-transaction"]),
+        (
+            "db_execute",
+            [*_MYSQL_BASE_ARGV, "--quick", "--single-transaction", "db_name"],
+        ),
+    ],
+)
+def test_execute_list__should_return_one_output_per_statement(
+    cmd_runner, check_output, method, expected_prefix
+):
+    check_output.side_effect = [b"output1", b"output2"]
+
+    execute_result = getattr(cmd_runner, method)(
+        ["SELECT `column` from `table`;", "SELECT `column2` from `table2`;"]
+    )
+
+    assert check_output.call_args_list == [
+        call([*expected_prefix, "--execute", "SELECT `column` from `table`;"]),
+        call([*expected_prefix, "--execute", "SELECT `column2` from `table2`;"]),
+    ]
+    assert execute_result == [b"output1", b"output2"]
+
+
+@pytest.mark.parametrize(
+    "method,expected_argv",
+    [
+        (
+            "execute_many",
+            [*_MYSQL_BASE_ARGV, "--quick", "--single-transaction"],
+        ),
+        (
+            "db_execute_many",
+            [*_MYSQL_BASE_ARGV, "--quick", "--single-transaction", "db_name"],
+        ),
+    ],
+)
+def test_execute_many__should_stream_statements_to_one_process(
+    cmd_runner, popen, check_output, method, expected_argv
+):
+    execute_result = getattr(cmd_runner, method)(
+        ["SELECT `column` from `table`;", "SELECT `column2` from `table2`;"]
+    )
+
+    popen.assert_called_once_with(
+        expected_argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE
+    )
+    popen.return_value.communicate.assert_called_once_with(
+        b"SELECT `column` from `table`;\nSELECT `column2` from `table2`;"
+    )
+    check_output.assert_not_called()
+    assert execute_result == [popen.return_value.communicate.return_value[0]]
+
+
+def test_execute_many__should_terminate_unterminated_statements(cmd_runner, popen):
+    cmd_runner.execute_many(["SELECT 1", "SELECT 2;", "SELECT 3;  "])
+
+    popen.return_value.communicate.assert_called_once_with(
+        b"SELECT 1\n;\nSELECT 2;\nSELECT 3;  "
+    )
+
+
+def test_execute_many__should_not_terminate_statements_inside_comments(
+    cmd_runner, popen
+):
+    cmd_runner.execute_many(["SELECT 1 -- first", "SELECT 2 # second"])
+
+    popen.return_value.communicate.assert_called_once_with(
+        b"SELECT 1 -- first\n;\nSELECT 2 # second\n;"
+    )
+
+
+def test_execute_many__when_process_fails__should_raise_masked_error(cmd_runner, popen):
+    popen.return_value.returncode = 1
+
+    with pytest.raises(subprocess.CalledProcessError) as e_info:
+        cmd_runner.execute_many(["SELECT 1;"])
+
+    assert "-pdb_password" not in e_info.value.cmd
+
+
+def test_execute_list__when_empty__should_not_call_cli(cmd_runner, popen, check_output):
+    assert cmd_runner.execute([]) == []
+    assert cmd_runner.db_execute([]) == []
+    assert cmd_runner.execute_many([]) == []
+    assert cmd_runner.db_execute_many([]) == []
+
+    popen.assert_not_called()
+    check_output.assert_not_called()
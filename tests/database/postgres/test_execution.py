@@ -1,14 +1,79 @@
 import pytest
-import unittest
-from unittest.mock import patch, Mock, ANY
+from unittest.mock import ANY, call
 from pynonymizer.database.exceptions import DependencyError
 from pynonymizer.database.postgres.execution import PSqlCmdRunner, PSqlDumpRunner
-from tests.helpers import SuperdictOf
+from tests.helpers import SuperdictOf, DUMP_PIPE_PARAMS
 import subprocess
 
+pytestmark = pytest.mark.usefixtures("which", "popen", "check_output")
+
+
+@pytest.fixture(scope="module")
+def dump_runner_no_password():
+    return PSqlDumpRunner(
+        db_host="1.2.3.4",
+        db_user="db_user",
+        db_pass=None,
+        db_name="db_name",
+        db_port="5432",
+        additional_opts="--quick --other-option=1",
+    )
+
+
+@pytest.fixture(scope="module")
+def dump_runner():
+    return PSqlDumpRunner(
+        db_host="1.2.3.4",
+        db_user="db_user",
+        db_pass="db_password",
+        db_name="db_name",
+        db_port="5432",
+        additional_opts="--quick --other-option=1",
+    )
+
+
+@pytest.fixture(scope="module")
+def cmd_runner_no_password():
+    return PSqlCmdRunner(
+        db_host="1.2.3.4",
+        db_user="db_user",
+        db_pass=None,
+        db_name="db_name",
+        db_port="5432",
+        additional_opts="--quick --other-option=1",
+    )
+
+
+@pytest.fixture(scope="module")
+def cmd_runner():
+    return PSqlCmdRunner(
+        "1.2.3.4",
+        "db_user",
+        "db_password",
+        "db_name",
+        db_port="5432",
+        additional_opts="--quick --other-option=1",
+    )
+
+
+# open_batch_processor keeps its process on the (module-scoped) runner, so close it after each test
+@pytest.fixture
+def batch_cmd_runner_no_password(cmd_runner_no_password):
+    yield cmd_runner_no_password
+    cmd_runner_no_password.close_batch_processor()
+
+
+@pytest.fixture
+def batch_cmd_runner(cmd_runner):
+    yield cmd_runner
+    cmd_runner.close_batch_processor()
+
+
+class TestNoExecutablesInPath:
+    @pytest.fixture(autouse=True)
+    def _setup(self, fresh_which):
+        fresh_which.return_value = None
 
-@patch("shutil.which", Mock(return_value=None))
-class NoExecutablesInPathTests(unittest.TestCase):
     def test_dump_runner_missing_mysqldump(self):
         with pytest.raises(DependencyError):
             PSqlDumpRunner("1.2.3.4", "user", "password", "name")
@@ -18,249 +83,190 @@ class NoExecutablesInPathTests(unittest.TestCase):
             PSqlCmdRunner("1.2.3.4", "user", "password", "name")
 
 
-@patch("subprocess.Popen")
-@patch("subprocess.check_output")
-class DumperWithMissingPasswordTests(unittest.TestCase):
-    @patch("shutil.which", Mock(return_value="fake/path/to/executable"))
-    def setup_method(self, test_method):
-        self.dump_runner = PSqlDumpRunner(
-            db_host="1.2.3.4",
-            db_user="db_user",
-            db_pass=None,
-            db_name="db_name",
-            db_port="5432",
-            additional_opts="--quick --other-option=1",
-        )
-
-    def test_open_dumper__should_not_pass_pgpassword(self, check_output, popen):
-        open_result = self.dump_runner.open_dumper()
-
-        popen.assert_called()
-        popen.assert_not_called_with(
-            ANY,
-            env=SuperdictOf({"PGPASSWORD": ANY}),
-            stdout=ANY,
-        )
-
-
-@patch("subprocess.Popen")
-@patch("subprocess.check_output")
-class DumperTests(unittest.TestCase):
-    @patch("shutil.which", Mock(return_value="fake/path/to/executable"))
-    def setup_method(self, test_method):
-        self.dump_runner = PSqlDumpRunner(
-            db_host="1.2.3.4",
-            db_user="db_user",
-            db_pass="db_password",
-            db_name="db_name",
-            db_port="5432",
-            additional_opts="--quick --other-option=1",
-        )
-
-    def test_open_dumper__should_open_pipe_to_pgdump(self, check_output, popen):
-        open_result = self.dump_runner.open_dumper()
-
-        # dumper should open a process for the current db dump, piping stdout for processing
-        popen.assert_called_with(
-            [
-                "pg_dump",
-                "--host",
-                "1.2.3.4",
-                "--port",
-                "5432",
-                "--username",
-                "db_user",
-                "--quick",
-                "--other-option=1",
-                "db_name",
-            ],
-            env=SuperdictOf({"PGPASSWORD": "db_password"}),
-            stdout=subprocess.PIPE,
-        )
-
-        # dumper should return the stdout of that process
-        assert open_result == popen.return_value.stdout
-
-
-@patch("subprocess.Popen")
-@patch("subprocess.check_output")
-class CmdWithAllArgsTets(unittest.TestCase):
-    @patch("shutil.which", Mock(return_value="fake/path/to/executable"))
-    def setup_method(self, test_method):
-        self.cmd_runner = PSqlCmdRunner(
-            db_host="1.2.3.4",
-            db_user="db_user",
-            db_pass=None,
-            db_name="db_name",
-            db_port="5432",
-            additional_opts="--quick --other-option=1",
-        )
-
-    def test_open_batch_processor__should_not_pass_pgpassword(
-        self, check_output, popen
-    ):
-        open_result = self.cmd_runner.open_batch_processor()
-
-        popen.assert_called()
-        popen.assert_not_called_with(
-            ANY,
-            env=SuperdictOf({"PGPASSWORD": ANY}),
-            stdin=ANY,
-        )
-
-    def test_execute__should_not_pass_pgpassword(self, check_output, popen):
-        execute_result = self.cmd_runner.execute("SELECT `column` from `table`;")
-
-        check_output.assert_called()
-        check_output.assert_not_called_with(ANY, env=SuperdictOf({"PGPASSWORD": ANY}))
-
-    def test_execute_list__should_not_pass_pgpassword(self, check_output, popen):
-        execute_result = self.cmd_runner.execute(
-            ["SELECT `column` from `table`;", "SELECT `column2` from `table2`;"]
-        )
-
-        check_output.assert_called()
-        check_output.assert_not_called_with(ANY, env=SuperdictOf({"PGPASSWORD": ANY}))
-
-
-@patch("subprocess.Popen")
-@patch("subprocess.check_output")
-class CmdTests(unittest.TestCase):
-    @patch("shutil.which", Mock(return_value="fake/path/to/executable"))
-    def setup_method(self, test_method):
-        self.cmd_runner = PSqlCmdRunner(
+def test_runner_construction__should_only_search_path_once(fresh_which):
+    PSqlCmdRunner("1.2.3.4", "user", "password", "name")
+    PSqlCmdRunner("1.2.3.4", "user", "password", "name")
+
+    fresh_which.assert_called_once_with("psql")
+
+
+def test_open_dumper__should_not_pass_pgpassword(dump_runner_no_password, popen):
+    open_result = dump_runner_no_password.open_dumper()
+
+    popen.assert_called()
+    popen.assert_not_called_with(
+        ANY,
+        env=SuperdictOf({"PGPASSWORD": ANY}),
+        stdout=ANY,
+        **DUMP_PIPE_PARAMS,
+    )
+
+
+def test_dump_to_file__should_not_pass_pgpassword(dump_runner_no_password, popen):
+    dump_runner_no_password.dump_to_file("/tmp/x.sql")
+
+    popen.assert_called()
+    popen.assert_not_called_with(
+        ANY,
+        env=SuperdictOf({"PGPASSWORD": ANY}),
+        stdout=ANY,
+    )
+
+
+def test_open_dumper__should_open_pipe_to_pgdump(dump_runner, popen):
+    open_result = dump_runner.open_dumper()
+
+    # dumper should open a process for the current db dump, piping stdout for processing
+    popen.assert_called_with(
+        [
+            "pg_dump",
+            "--host",
             "1.2.3.4",
+            "--port",
+            "5432",
+            "--username",
             "db_user",
-            "db_password",
+            "--quick",
+            "--other-option=1",
             "db_name",
-            db_port="5432",
-            additional_opts="--quick --other-option=1",
-        )
+        ],
+        env=SuperdictOf({"PGPASSWORD": "db_password"}),
+        stdout=subprocess.PIPE,
+        **DUMP_PIPE_PARAMS,
+    )
 
-    def test_open_batch_processor__should_open_psql_pipe(self, check_output, popen):
-        open_result = self.cmd_runner.open_batch_processor()
+    # dumper should return the stdout of that process
+    assert open_result == popen.return_value.stdout
 
-        # dumper should open a process for the current db dump, piping stdout for processing
-        popen.assert_called_with(
-            [
-                "psql",
-                "--host",
-                "1.2.3.4",
-                "--port",
-                "5432",
-                "--username",
-                "db_user",
-                "--dbname",
-                "db_name",
-                "--quiet",
-                "--quick",
-                "--other-option=1",
-            ],
-            env=SuperdictOf({"PGPASSWORD": "db_password"}),
-            stdin=subprocess.PIPE,
-        )
 
-        # dumper should return the stdin of that process
-        assert open_result == popen.return_value.stdin
+def test_dump_to_file__should_write_file(dump_runner, popen):
+    dump_runner.dump_to_file("/tmp/x.sql")
 
-    def test_execute(self, check_output, popen):
-        execute_result = self.cmd_runner.execute("SELECT `column` from `table`;")
+    # dumper should have pg_dump write the file directly, without piping stdout
+    popen.assert_called_with(
+        [
+            "pg_dump",
+            "--host",
+            "1.2.3.4",
+            "--port",
+            "5432",
+            "--username",
+            "db_user",
+            "--quick",
+            "--other-option=1",
+            "--file",
+            "/tmp/x.sql",
+            "db_name",
+        ],
+        env=SuperdictOf({"PGPASSWORD": "db_password"}),
+        stdout=subprocess.DEVNULL,
+    )
 
-        check_output.assert_called_with(
-            [
-                "psql",
-                "--host",
-                "1.2.3.4",
-                "--port",
-                "5432",
-                "--username",
-                "db_user",
-                "--quick",
-                "--other-option=1",
-                "--command",
-                "SELECT `column` from `table`;",
-            ],
-            env=SuperdictOf({"PGPASSWORD": "db_password"}),
-        )
+    # dumper should wait for pg_dump to finish
+    popen.return_value.wait.assert_called_once_with()
 
-    def test_execute_list(self, check_output, popen):
-        execute_result = self.cmd_runner.execute(
-            ["SELECT `column` from `table`;", "SELECT `column2` from `table2`;"]
-        )
 
-        check_output.assert_any_call(
-            [
-                "psql",
-                "--host",
-                "1.2.3.4",
-                "--port",
-                "5432",
-                "--username",
-                "db_user",
-                "--quick",
-                "--other-option=1",
-                "--command",
-                "SELECT `column` from `table`;",
-            ],
-            env=SuperdictOf({"PGPASSWORD": "db_password"}),
-        )
+def test_dump_to_file__when_process_fails__should_raise(dump_runner, popen):
+    popen.return_value.wait.return_value = 2
 
-        check_output.assert_any_call(
-            [
-                "psql",
-                "--host",
-                "1.2.3.4",
-                "--port",
-                "5432",
-                "--username",
-                "db_user",
-                "--quick",
-                "--other-option=1",
-                "--command",
-                "SELECT `column2` from `table2`;",
-            ],
-            env=SuperdictOf({"PGPASSWORD": "db_password"}),
-        )
+    with pytest.raises(subprocess.CalledProcessError) as e_info:
+        dump_runner.dump_to_file("/tmp/x.sql")
+
+    assert e_info.value.returncode == 2
+    assert e_info.value.cmd == popen.return_value.args
+
+
+def test_open_batch_processor__should_not_pass_pgpassword(
+    batch_cmd_runner_no_password, popen
+):
+    open_result = batch_cmd_runner_no_password.open_batch_processor()
 
-    def test_db_execute(self, check_output, popen):
-        """
-        execute should execute an arbitrary statement with valid args
-        """
-        execute_result = self.cmd_runner.db_execute("SELECT `column` from `table`;")
+    popen.assert_called()
+    popen.assert_not_called_with(
+        ANY,
+        env=SuperdictOf({"PGPASSWORD": ANY}),
+        stdin=ANY,
+    )
 
-        check_output.assert_called_with(
+
+def test_execute__should_not_pass_pgpassword(cmd_runner_no_password, check_output):
+    execute_result = cmd_runner_no_password.execute("SELECT `column` from `table`;")
+
+    check_output.assert_called()
+    check_output.mock.assert_not_called_with(ANY, env=SuperdictOf({"PGPASSWORD": ANY}))
+
+
+@pytest.mark.parametrize(
+    "method", ["execute", "db_execute", "execute_many", "db_execute_many"]
+)
+def test_execute_list__should_not_pass_pgpassword(
+    cmd_runner_no_password, check_output, method
+):
+    execute_result = getattr(cmd_runner_no_password, method)(
+        ["SELECT `column` from `table`;", "SELECT `column2` from `table2`;"]
+    )
+
+    check_output.assert_called()
+    check_output.mock.assert_not_called_with(ANY, env=SuperdictOf({"PGPASSWORD": ANY}))
+
+
+def test_open_batch_processor__should_open_psql_pipe(batch_cmd_runner, popen):
+    open_result = batch_cmd_runner.open_batch_processor()
+
+    # dumper should open a process for the current db dump, piping stdout for processing
+    popen.assert_called_with(
+        [
+            "psql",
+            "--host",
+            "1.2.3.4",
+            "--port",
+            "5432",
+            "--username",
+            "db_user",
+            "--dbname",
+            "db_name",
+            "--quiet",
+            "--quick",
+            "--other-option=1",
+        ],
+        env=SuperdictOf({"PGPASSWORD": "db_password"}),
+        stdin=subprocess.PIPE,
+    )
+
+    # dumper should return the stdin of that process
+    assert open_result == popen.return_value.stdin
+
+
+_PSQL_BASE_ARGV = [
+    "psql",
+    "--host",
+    "1.2.3.4",
+    "--port",
+    "5432",
+    "--username",
+    "db_user",
+]
+
+
+@pytest.mark.parametrize(
+    "method,statement,expected_argv",
+    [
+        (
+            "execute",
+            "SELECT `column` from `table`;",
             [
-                "psql",
-                "--host",
-                "1.2.3.4",
-                "--port",
-                "5432",
-                "--username",
-                "db_user",
-                "--dbname",
-                "db_name",
+                *_PSQL_BASE_ARGV,
                 "--quick",
                 "--other-option=1",
                 "--command",
                 "SELECT `column` from `table`;",
             ],
-            env=SuperdictOf({"PGPASSWORD": "db_password"}),
-        )
-
-    def test_db_execute_list(self, check_output, popen):
-        execute_result = self.cmd_runner.db_execute(
-            ["SELECT `column` from `table`;", "SELECT `column2` from `table2`;"]
-        )
-
-        check_output.assert_any_call(
+        ),
+        (
+            "db_execute",
+            "SELECT `column` from `table`;",
             [
-                "psql",
-                "--host",
-                "1.2.3.4",
-                "--port",
-                "5432",
-                "--username",
-                "db_user",
+                *_PSQL_BASE_ARGV,
                 "--dbname",
                 "db_name",
                 "--quick",
@@ -268,52 +274,148 @@ class CmdTests(unittest.TestCase):
                 "--command",
                 "SELECT `column` from `table`;",
             ],
-            env=SuperdictOf({"PGPASSWORD": "db_password"}),
-        )
-        check_output.assert_any_call(
+        ),
+        (
+            "get_single_result",
+            "SELECT `column` from `table`;",
             [
-                "psql",
-                "--host",
-                "1.2.3.4",
-                "--port",
-                "5432",
-                "--username",
-                "db_user",
+                *_PSQL_BASE_ARGV,
                 "--dbname",
                 "db_name",
+                "-tA",
                 "--quick",
                 "--other-option=1",
                 "--command",
-                "SELECT `column2` from `table2`;",
+                "SELECT `column` from `table`;",
             ],
+        ),
+    ],
+)
+def test_cmd_runner_argv(cmd_runner, check_output, method, statement, expected_argv):
+    """
+    each statement method should call the psql cli with the full set of args and the password in env
+    """
+    getattr(cmd_runner, method)(statement)
+
+    check_output.assert_called_once_with(
+        expected_argv, env=SuperdictOf({"PGPASSWORD": "db_password"})
+    )
+
+
+def test_get_single_result(cmd_runner, check_output):
+    """
+    get_single_result should return the decoded, no-column result
+    """
+    single_result = cmd_runner.get_single_result("SELECT `column` from `table`;")
+
+    assert single_result == check_output.return_value.decode.return_value
+
+
+@pytest.mark.parametrize(
+    "method,expected_prefix",
+    [
+        ("execute", [*_PSQL_BASE_ARGV, "--quick", "--other-option=1"]),
+        (
+            "db_execute",
+            [*_PSQL_BASE_ARGV, "--dbname", "db_name", "--quick", "--other-option=1"],
+        ),
+    ],
+)
+def test_execute_list__should_return_one_output_per_statement(
+    cmd_runner, check_output, method, expected_prefix
+):
+    check_output.side_effect = [b"output1", b"output2"]
+
+    execute_result = getattr(cmd_runner, method)(
+        ["SELECT `column` from `table`;", "SELECT `column2` from `table2`;"]
+    )
+
+    assert check_output.call_args_list == [
+        call(
+            [*expected_prefix, "--command", "SELECT `column` from `table`;"],
             env=SuperdictOf({"PGPASSWORD": "db_password"}),
-        )
+        ),
+        call(
+            [*expected_prefix, "--command", "SELECT `column2` from `table2`;"],
+            env=SuperdictOf({"PGPASSWORD": "db_password"}),
+        ),
+    ]
+    assert execute_result == [b"output1", b"output2"]
 
-    def test_get_single_result(self, check_output, popen):
-        """
-        execute should execute an arbitrary statement and return the decoded, no-column result
-        """
-        single_result = self.cmd_runner.get_single_result(
-            "SELECT `column` from `table`;"
-        )
 
-        check_output.assert_called_with(
+@pytest.mark.parametrize(
+    "method,expected_argv",
+    [
+        (
+            "execute_many",
+            [
+                *_PSQL_BASE_ARGV,
+                "--quick",
+                "--other-option=1",
+                "--set",
+                "ON_ERROR_STOP=1",
+            ],
+        ),
+        (
+            "db_execute_many",
             [
-                "psql",
-                "--host",
-                "1.2.3.4",
-                "--port",
-                "5432",
-                "--username",
-                "db_user",
+                *_PSQL_BASE_ARGV,
                 "--dbname",
                 "db_name",
-                "-tA",
                 "--quick",
                 "--other-option=1",
-                "--command",
-                "SELECT `column` from `table`;",
+                "--set",
+                "ON_ERROR_STOP=1",
             ],
-            env=SuperdictOf({"PGPASSWORD": "db_password"}),
-        )
-        assert single_result == check_output.return_value.decode.return_value
+        ),
+    ],
+)
+def test_execute_many__should_run_statements_as_commands_of_one_process(
+    cmd_runner, popen, check_output, method, expected_argv
+):
+    execute_result = getattr(cmd_runner, method)(
+        ["SELECT `column` from `table`;", "SELECT `column2` from `table2`;"]
+    )
+
+    check_output.assert_called_once_with(
+        [
+            *expected_argv,
+            "--command",
+            "SELECT `column` from `table`;",
+            "--command",
+            "SELECT `column2` from `table2`;",
+        ],
+        env=SuperdictOf({"PGPASSWORD": "db_password"}),
+    )
+    popen.assert_not_called()
+    assert execute_result == [check_output.return_value]
+
+
+def test_execute_many__should_pass_statements_verbatim(cmd_runner, check_output):
+    """
+    psql interpolates :variables and runs backslash meta-commands in scripts, but not in --command strings.
+    Statements must stay as separate --command args, rather than being fed to psql as a script.
+    """
+    statements = ["UPDATE t SET c = ':not_a_var';", "UPDATE t SET c = '\\q';"]
+
+    cmd_runner.db_execute_many(statements)
+
+    argv = check_output.call_args[0][0]
+    assert argv[-4:] == ["--command", statements[0], "--command", statements[1]]
+
+
+def test_execute_many__when_process_fails__should_raise(cmd_runner, check_output):
+    check_output.side_effect = subprocess.CalledProcessError(3, "psql")
+
+    with pytest.raises(subprocess.CalledProcessError):
+        cmd_runner.execute_many(["SELECT 1;"])
+
+
+def test_execute_list__when_empty__should_not_call_cli(cmd_runner, popen, check_output):
+    assert cmd_runner.execute([]) == []
+    assert cmd_runner.db_execute([]) == []
+    assert cmd_runner.execute_many([]) == []
+    assert cmd_runner.db_execute_many([]) == []
+
+    popen.assert_not_called()
+    check_output.assert_not_called()
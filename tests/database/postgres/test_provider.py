@@ -6,6 +6,7 @@ from pynonymizer.database.postgres import PostgreSqlProvider
 from pynonymizer.strategy.database import DatabaseStrategy
 from pynonymizer.strategy.table import TruncateTableStrategy
 from pynonymizer.database.exceptions import UnsupportedTableStrategyError
+from pynonymizer.database.basic.output import RawOutput
 from tests.helpers import list_rindex
 
 
@@ -123,6 +124,26 @@ def test_dump_database(resolve_output, query_factory, execution):
     execution.PSqlDumpRunner.return_value.open_dumper.return_value.read.assert_called()
 
 
+@patch("pynonymizer.database.postgres.execution", autospec=True)
+@patch("pynonymizer.database.postgres.query_factory", autospec=True)
+@patch("pynonymizer.database.postgres.resolve_output")
+def test_dump_database__when_raw_output__should_dump_directly_to_file(
+    resolve_output, query_factory, execution
+):
+    provider = PostgreSqlProvider(
+        "1.2.3.4", "root", "password", "db_name", seed_rows=150
+    )
+    resolve_output.return_value = RawOutput("testfile.sql")
+
+    provider.dump_database("testfile.sql")
+
+    # dumper should write the file itself, rather than streaming it through the provider
+    execution.PSqlDumpRunner.return_value.dump_to_file.assert_called_once_with(
+        "testfile.sql"
+    )
+    execution.PSqlDumpRunner.return_value.open_dumper.assert_not_called()
+
+
 @patch("pynonymizer.database.postgres.execution", autospec=True)
 @patch("pynonymizer.database.postgres.query_factory", autospec=True)
 def test_anonymize_database_unsupported_table_strategy(query_factory, execution):
@@ -259,7 +280,7 @@ def test_anonymize_database(
         call.execution.PSqlCmdRunner().db_execute(query_factory.get_truncate_table())
     )
     ix_update_table = manager.mock_calls.index(
-        call.execution.PSqlCmdRunner().db_execute(query_factory.get_update_table())
+        call.execution.PSqlCmdRunner().db_execute_many(query_factory.get_update_table())
     )
     ix_drop_seed = manager.mock_calls.index(
         call.execution.PSqlCmdRunner().db_execute(query_factory.get_drop_seed_table())
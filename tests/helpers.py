@@ -1,7 +1,13 @@
 import re
+import sys
 import pytest
 from contextlib import contextmanager
 
+# Popen kwargs expected for a streamed dump: 1MiB buffer and pipe. The pipe size can only be set from python 3.10
+DUMP_PIPE_PARAMS = {"bufsize": 1048576}
+if sys.version_info >= (3, 10):
+    DUMP_PIPE_PARAMS["pipesize"] = 1048576
+
 
 class AnyObject:
     def __eq__(self, actual):
@@ -16,10 +22,14 @@ class SuperdictOf:
         self.required_dict = required_dict
 
     def __eq__(self, actual):
+        # items views compare by hash lookups into actual, so this is O(len(required_dict))
         return self.required_dict.items() <= actual.items()
 
     def __ne__(self, actual):
-        return not (self.required_dict.items() <= actual.items())
+        return not self.__eq__(actual)
+
+    def __repr__(self):
+        return f"SuperdictOf({self.required_dict!r})"
 
 
 class ComparableRegex: